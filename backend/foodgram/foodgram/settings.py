@@ -44,6 +44,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'utils.routers.replica_routing_middleware',
+    'utils.relations.user_relations_middleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -71,6 +73,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+# 'wsgi' (gunicorn sync workers) or 'asgi' (gunicorn uvicorn workers)
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+ASYNC_VIEWS = SERVER_MODE == 'asgi'
+
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
@@ -82,6 +88,52 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        # persistent connections save a TCP and auth handshake per request;
+        # async mode shares connections across threads poorly, so it should
+        # run behind an external pooler with CONN_MAX_AGE=0
+        'CONN_MAX_AGE': int(
+            os.getenv('DB_CONN_MAX_AGE', 0 if ASYNC_VIEWS else 60)
+        ),
+        'CONN_HEALTH_CHECKS': (
+            os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+        ),
+        # transaction pooling (pgbouncer) hands each transaction a different
+        # server connection, which breaks server-side cursors
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DB_POOL_MODE') == 'pgbouncer',
+        'OPTIONS': {
+            'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 10)),
+        },
+    }
+}
+
+# Read replicas: comma-separated host[:port] list of streaming replicas
+# of the default database. Safe-method requests read from them, a client
+# reads from the primary for REPLICA_PIN_TIMEOUT seconds after a write.
+
+for index, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))
+):
+    replica_host, _, replica_port = replica.partition(':')
+    DATABASES['replica_%d' % index] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['utils.routers.ReplicaRouter']
+REPLICA_PIN_TIMEOUT = int(os.getenv('REPLICA_PIN_TIMEOUT', 10))
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
     }
 }
 
@@ -103,11 +155,41 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# The first hasher hashes new passwords, the rest only verify old hashes.
+# Hashes made with another hasher or cost are upgraded on the next login.
+# 'argon2' requires the argon2-cffi package.
+
+PASSWORD_HASHER_ALIASES = {
+    'scrypt': 'utils.hashers.ScryptPasswordHasher',
+    'argon2': 'utils.hashers.Argon2PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'scrypt')
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_ALIASES[PASSWORD_HASHER],
+    *(
+        hasher for alias, hasher in PASSWORD_HASHER_ALIASES.items()
+        if alias != PASSWORD_HASHER
+    ),
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+PASSWORD_SCRYPT_WORK_FACTOR = int(
+    os.getenv('PASSWORD_SCRYPT_WORK_FACTOR', 2 ** 14)
+)
+PASSWORD_SCRYPT_BLOCK_SIZE = int(os.getenv('PASSWORD_SCRYPT_BLOCK_SIZE', 8))
+PASSWORD_SCRYPT_PARALLELISM = int(os.getenv('PASSWORD_SCRYPT_PARALLELISM', 1))
+PASSWORD_ARGON2_TIME_COST = int(os.getenv('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(
+    os.getenv('PASSWORD_ARGON2_MEMORY_COST', 19 * 1024)
+)
+PASSWORD_ARGON2_PARALLELISM = int(os.getenv('PASSWORD_ARGON2_PARALLELISM', 1))
+
 # REST Framework Settings
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'utils.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
@@ -115,6 +197,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'utils.pagination.CustomPageNumberPagination',
 }
 
+TOKEN_CACHE_TIMEOUT = 5 * 60
+TOKEN_CACHE_LOCAL_TIMEOUT = 10
+TOKEN_CACHE_LOCAL_SIZE = 1024
+
 DJOSER = {
     'LOGIN_FIELD': 'email'
 }
@@ -142,6 +228,37 @@ STATIC_ROOT = Path(BASE_DIR, 'foodgram_static')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Background threads for media file processing
+
+FILE_WORKERS = 2
+
+# Recipe images
+
+RECIPE_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+RECIPE_IMAGE_MAX_PIXELS = 40_000_000
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1600, 1600),
+}
+RECIPE_IMAGE_QUALITY = 80
+
 # Data files
 
 DATA_ROOT = Path(BASE_DIR).resolve().parent.joinpath('data')
+
+# Shopping list
+
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60 * 24
+SHOPPING_LIST_CACHE_MAX_SIZE = 1024 * 1024
+
+# Reference data (tags, ingredients)
+
+REFERENCE_DATA_MAX_AGE = 60
+REFERENCE_DATA_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Ingredient search
+
+INGREDIENT_SEARCH_LIMIT = 50
+# 'database' or 'memory', see utils.search.IngredientIndex
+INGREDIENT_SEARCH_ENGINE = os.getenv('INGREDIENT_SEARCH_ENGINE', 'database')
@@ -11,7 +11,9 @@ class IngredientsInline(admin.TabularInline):
 
 @admin.register(Recipe)
 class RecipesAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author__username', 'favorites_count')
+    list_display = (
+        'name', 'author__username', 'favorites_count', 'carts_count'
+    )
     list_filter = ('author', 'name', 'tags')
     fields = (
         'author', 'name', 'image', 'text', 'tags'
@@ -22,13 +24,17 @@ class RecipesAdmin(admin.ModelAdmin):
         IngredientsInline
     ]
 
-    def favorites_count(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
-
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
         return queryset.prefetch_related('ingredients')
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        recipe = form.instance
+        Recipe.objects.filter(pk=recipe.pk).update(
+            ingredients_count=recipe.ingredientinrecipe_set.count()
+        )
+
     def author__username(self, obj):
         return obj.author.username
 
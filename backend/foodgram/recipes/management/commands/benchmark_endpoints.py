@@ -0,0 +1,147 @@
+from random import Random
+from statistics import median
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe, ShoppingCart, Tag
+from users.models import Subscription, User
+
+ENDPOINTS = (
+    '/api/recipes/',
+    '/api/recipes/?page=1000',
+    '/api/recipes/?cursor=',
+    '/api/recipes/?author={author}',
+    '/api/recipes/?tags={tag}',
+    '/api/recipes/?is_favorited=1',
+    '/api/recipes/?is_in_shopping_cart=1',
+    '/api/recipes/?ordering=-favorites_count',
+    '/api/recipes/download_shopping_cart/?format=txt',
+    '/api/users/subscriptions/',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure API latency on a large data set. Run it once as is and '
+        'once with --without-indexes to compare before and after the '
+        'composite indexes.'
+    )
+    # models whose Meta.indexes were added for the measured endpoints
+    indexed_models = (Recipe, Favorite, ShoppingCart, Subscription)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Create this many synthetic recipes first, e.g. 1000000'
+        )
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Requests per endpoint'
+        )
+        parser.add_argument(
+            '--without-indexes', action='store_true',
+            help=(
+                'Drop the composite indexes in a transaction, measure and '
+                'roll back. Locks the tables while it runs.'
+            )
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'], options['users'], options['batch_size'])
+        user = User.objects.filter(username__startswith='benchmark_').first()
+        tag = Tag.objects.first()
+        if user is None or tag is None:
+            raise CommandError('No benchmark data, run with --seed first')
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        if not options['without_indexes']:
+            self.measure(client, user, tag, options['repeat'])
+            return
+        # unlike rolling the migrations back, this keeps later schema
+        # changes in place and restores the indexes afterwards
+        if not connection.features.can_rollback_ddl:
+            raise CommandError('--without-indexes needs transactional DDL')
+        with transaction.atomic(), connection.cursor() as cursor:
+            for model in self.indexed_models:
+                for index in model._meta.indexes:
+                    cursor.execute(
+                        'DROP INDEX %s' % connection.ops.quote_name(index.name)
+                    )
+            self.measure(client, user, tag, options['repeat'])
+            transaction.set_rollback(True)
+
+    def measure(self, client, user, tag, repeat):
+        self.stdout.write('%-50s %10s %10s' % ('endpoint', 'p50 ms', 'max ms'))
+        for endpoint in ENDPOINTS:
+            url = endpoint.format(author=user.pk, tag=tag.slug)
+            timings = []
+            for _ in range(repeat):
+                started = perf_counter()
+                response = client.get(url)
+                timings.append((perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(
+                        '%s returned %d' % (url, response.status_code)
+                    )
+            self.stdout.write('%-50s %10.2f %10.2f' % (
+                url, median(timings), max(timings)
+            ))
+
+    @transaction.atomic
+    def seed(self, recipes, users, batch_size):
+        random = Random(0)
+        User.objects.bulk_create(
+            [
+                User(
+                    username='benchmark_%d' % index,
+                    email='benchmark_%d@example.com' % index
+                ) for index in range(users)
+            ],
+            batch_size=batch_size, ignore_conflicts=True
+        )
+        user_ids = list(User.objects.filter(
+            username__startswith='benchmark_'
+        ).values_list('id', flat=True))
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        if not tag_ids:
+            raise CommandError('No tags, run load_default_data first')
+        for start in range(0, recipes, batch_size):
+            batch = Recipe.objects.bulk_create([
+                Recipe(
+                    author_id=random.choice(user_ids),
+                    name='Рецепт %d' % index, text='Описание',
+                    image='recipes/benchmark.png',
+                    cooking_time=random.randint(1, 180)
+                ) for index in range(start, min(start + batch_size, recipes))
+            ])
+            Recipe.tags.through.objects.bulk_create([
+                Recipe.tags.through(
+                    recipe_id=recipe.pk, tag_id=random.choice(tag_ids)
+                ) for recipe in batch
+            ])
+            for model in (Favorite, ShoppingCart):
+                model.objects.bulk_create(
+                    [
+                        model(
+                            recipe_id=recipe.pk,
+                            user_id=random.choice(user_ids)
+                        ) for recipe in random.sample(batch, len(batch) // 10)
+                    ],
+                    ignore_conflicts=True
+                )
+            self.stdout.write('Seeded %d recipes' % (start + len(batch)))
+        Subscription.objects.bulk_create(
+            [
+                Subscription(subscriber_id=subscriber, author_id=author)
+                for subscriber in user_ids[:100]
+                for author in random.sample(user_ids, 20)
+                if subscriber != author
+            ],
+            ignore_conflicts=True
+        )
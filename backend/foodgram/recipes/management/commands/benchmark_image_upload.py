@@ -0,0 +1,44 @@
+from base64 import b64encode
+from io import BytesIO
+from time import perf_counter
+from tracemalloc import get_traced_memory, start, stop
+
+from django.core.management.base import BaseCommand
+from drf_extra_fields.fields import Base64ImageField as ExtraBase64ImageField
+from PIL import Image
+
+from utils.fields import Base64ImageField
+
+
+class Command(BaseCommand):
+    help = 'Compare peak memory of base64 image decoding implementations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--side', type=int, default=2000,
+            help='Width and height of the generated noise image'
+        )
+
+    def handle(self, *args, **options):
+        buffer = BytesIO()
+        Image.effect_noise(
+            (options['side'], options['side']), 64
+        ).convert('RGB').save(buffer, 'PNG')
+        encoded = 'data:image/png;base64,' + b64encode(
+            buffer.getvalue()
+        ).decode('ascii')
+        self.stdout.write('Image: %.1f MiB, base64: %.1f MiB' % (
+            len(buffer.getvalue()) / 2 ** 20, len(encoded) / 2 ** 20
+        ))
+        del buffer
+        for field in (ExtraBase64ImageField(), Base64ImageField()):
+            start()
+            started = perf_counter()
+            field.to_internal_value(encoded)
+            elapsed = perf_counter() - started
+            peak = get_traced_memory()[1]
+            stop()
+            self.stdout.write('%-40s %8.1f ms %8.1f MiB peak' % (
+                '%s.%s' % (type(field).__module__, type(field).__name__),
+                elapsed * 1000, peak / 2 ** 20
+            ))
@@ -0,0 +1,52 @@
+from time import perf_counter
+from tracemalloc import get_traced_memory, start, stop
+
+from django.core.management.base import BaseCommand
+
+from utils.shopping_list import RENDERERS
+
+
+class Command(BaseCommand):
+    help = 'Compare latency and memory of the shopping list renderers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=(10, 100, 1000),
+            help='Number of ingredients in the generated carts'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Number of renders per renderer and cart size'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            '%-6s %8s %12s %12s %12s' % (
+                'format', 'rows', 'avg ms', 'peak KiB', 'size KiB'
+            )
+        )
+        for size in options['sizes']:
+            ingredients = [
+                ('Ингредиент %d' % index, 'г', index)
+                for index in range(size)
+            ]
+            for file_format, renderer in RENDERERS.items():
+                # warm up lazy imports and font registration
+                b''.join(renderer.render(ingredients[:1]))
+                elapsed, peak, length = 0, 0, 0
+                for _ in range(options['repeat']):
+                    start()
+                    started = perf_counter()
+                    length = sum(
+                        len(chunk) for chunk in renderer.render(ingredients)
+                    )
+                    elapsed += perf_counter() - started
+                    peak = max(peak, get_traced_memory()[1])
+                    stop()
+                self.stdout.write(
+                    '%-6s %8d %12.2f %12.1f %12.1f' % (
+                        file_format, size,
+                        elapsed / options['repeat'] * 1000,
+                        peak / 1024, length / 1024
+                    )
+                )
@@ -0,0 +1,91 @@
+import psycopg2
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+ACTIVITY_SQL = '''
+    SELECT COALESCE(state, 'background'), COUNT(*)
+    FROM pg_stat_activity
+    WHERE datname = current_database()
+    GROUP BY 1
+    ORDER BY 2 DESC
+'''
+LIMITS_SQL = '''
+    SELECT
+        current_setting('max_connections')::int,
+        current_setting('superuser_reserved_connections')::int,
+        (SELECT COUNT(*) FROM pg_stat_activity)
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Show database connection usage against max_connections, and the '
+        'pgbouncer pools when DB_POOL_MODE=pgbouncer, to size gunicorn '
+        'workers: every worker thread holds at most one connection.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--pgbouncer', action='store_true',
+            help='Also read SHOW POOLS from the pgbouncer admin console'
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'postgresql':
+            raise CommandError('Connection stats need PostgreSQL')
+        settings_dict = connection.settings_dict
+        self.stdout.write(
+            'CONN_MAX_AGE %s, CONN_HEALTH_CHECKS %s, '
+            'server-side cursors %s' % (
+                settings_dict['CONN_MAX_AGE'],
+                settings_dict['CONN_HEALTH_CHECKS'],
+                'off' if settings_dict['DISABLE_SERVER_SIDE_CURSORS']
+                else 'on',
+            )
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(LIMITS_SQL)
+            max_connections, reserved, total = cursor.fetchone()
+            cursor.execute(ACTIVITY_SQL)
+            activity = cursor.fetchall()
+        available = max_connections - reserved
+        self.stdout.write(
+            'server: %d of %d usable connections in use (%d free)' % (
+                total, available, available - total
+            )
+        )
+        for state, count in activity:
+            self.stdout.write('  %-30s %d' % (state, count))
+        if options['pgbouncer']:
+            self.show_pools(settings_dict)
+
+    def show_pools(self, settings_dict):
+        try:
+            admin = psycopg2.connect(
+                dbname='pgbouncer',
+                user=settings_dict['USER'],
+                password=settings_dict['PASSWORD'],
+                host=settings_dict['HOST'],
+                port=settings_dict['PORT'],
+            )
+        except psycopg2.Error as error:
+            raise CommandError('pgbouncer admin console: %s' % error)
+        # the admin console rejects transaction blocks
+        admin.autocommit = True
+        try:
+            with admin.cursor() as cursor:
+                cursor.execute('SHOW POOLS')
+                columns = [column.name for column in cursor.description]
+                rows = cursor.fetchall()
+        finally:
+            admin.close()
+        self.stdout.write('pgbouncer pools:')
+        for row in rows:
+            pool = dict(zip(columns, row))
+            self.stdout.write(
+                '  %(database)s/%(user)s: %(cl_active)s active and '
+                '%(cl_waiting)s waiting clients, %(sv_active)s active and '
+                '%(sv_idle)s idle server connections' % pool
+            )
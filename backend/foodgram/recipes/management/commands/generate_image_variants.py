@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from utils.images import generate_variants
+
+
+class Command(BaseCommand):
+    help = 'Generate resized variants for recipe images that lack them'
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.filter(image_variants={}).exclude(
+            image=''
+        ).values_list('pk', 'image')
+        count = 0
+        for pk, image in recipes.iterator():
+            generate_variants(pk, image)
+            count += 1
+        self.stdout.write(
+            self.style.SUCCESS('Processed images of %d recipes' % count)
+        )
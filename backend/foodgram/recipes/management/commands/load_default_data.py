@@ -1,33 +1,109 @@
-from json import load
 from pathlib import Path
+from time import perf_counter
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
 from recipes.models import Ingredient, Tag
+from utils.caching import (
+    INGREDIENTS_CACHE_KEY, TAGS_CACHE_KEY, invalidate_cached_list
+)
+from utils.functions import iter_json_array
+from utils.search import invalidate_ingredient_index
+
+MODELS = {
+    'ingredients': (Ingredient, ('name', 'measurement_unit')),
+    'tags': (Tag, ('slug',)),
+}
 
 
 class Command(BaseCommand):
     help = 'Upload read only data in database from data .json'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files', nargs='*',
+            help='JSON files to import, all files in DATA_ROOT by default'
+        )
+        parser.add_argument(
+            '--model', choices=MODELS,
+            help='Model to import into, guessed from the file name by default'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows upserted per query'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Run the import and roll it back'
+        )
+
     def handle(self, *args, **options):
-        models = {
-            'ingredients.json': Ingredient,
-            'tags.json': Tag
-        }
-        for file in Path(settings.DATA_ROOT).iterdir():
-            if file.suffix != '.json':
-                continue
-            with open(file, 'r') as data:
-                data_obj = load(data)
-            for row in data_obj:
-                instance = (
-                    models.get(file.name)() if
-                    models.get(file.name) is not None else None
-                )
-                if not instance:
+        if options['batch_size'] < 1:
+            raise CommandError('Batch size must be positive')
+        files = [Path(file) for file in options['files']] or sorted(
+            file for file in Path(settings.DATA_ROOT).iterdir()
+            if file.suffix == '.json'
+        )
+        started = perf_counter()
+        total = 0
+        with transaction.atomic():
+            for file in files:
+                model_name = options['model'] or file.stem
+                if model_name not in MODELS:
                     raise CommandError('File name doesn`t match any model')
-                for key, value in row.items():
-                    setattr(instance, key, value)
-                instance.save()
-        self.stdout.write(self.style.SUCCESS('Successfully imported!'))
+                count = self.import_file(
+                    file, *MODELS[model_name], options['batch_size']
+                )
+                self.stdout.write('%s: %d rows' % (file.name, count))
+                total += count
+            if options['dry_run']:
+                transaction.set_rollback(True)
+            else:
+                # bulk_create doesn't send post_save
+                invalidate_ingredient_index()
+                invalidate_cached_list(INGREDIENTS_CACHE_KEY)
+                invalidate_cached_list(TAGS_CACHE_KEY)
+        elapsed = perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            '%s %d rows in %.2f s (%.0f rows/s)' % (
+                'Checked' if options['dry_run'] else 'Successfully imported',
+                total, elapsed, total / elapsed if elapsed else total
+            )
+        ))
+
+    def import_file(self, file, model, unique_fields, batch_size):
+        count = 0
+        batch = {}
+        with open(file, 'r', encoding='utf-8') as data:
+            try:
+                for row in iter_json_array(data):
+                    row.pop('id', None)
+                    # rows with the same key can't be upserted in one query
+                    batch[tuple(row.get(key) for key in unique_fields)] = row
+                    if len(batch) >= batch_size:
+                        count += self.upsert(model, unique_fields, batch)
+                        batch = {}
+            except ValueError as error:
+                raise CommandError('%s: %s' % (file.name, error))
+        if batch:
+            count += self.upsert(model, unique_fields, batch)
+        return count
+
+    def upsert(self, model, unique_fields, batch):
+        try:
+            objects = [model(**row) for row in batch.values()]
+        except TypeError as error:
+            raise CommandError(error)
+        update_fields = sorted(
+            set().union(*batch.values()) - set(unique_fields)
+        )
+        if update_fields:
+            model.objects.bulk_create(
+                objects, update_conflicts=True,
+                unique_fields=unique_fields, update_fields=update_fields
+            )
+        else:
+            model.objects.bulk_create(objects, ignore_conflicts=True)
+        return len(objects)
@@ -0,0 +1,112 @@
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPException
+from itertools import cycle, islice
+from time import perf_counter
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+PATHS = (
+    '/api/tags/',
+    '/api/ingredients/',
+    '/api/ingredients/?name=соль',
+    '/api/recipes/',
+    '/api/recipes/?limit=6',
+    '/api/recipes/{recipe_id}/',
+)
+# only sent with --token
+AUTH_PATHS = (
+    '/api/recipes/?is_favorited=1',
+    '/api/users/subscriptions/',
+    '/api/recipes/download_shopping_cart/?format=txt',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Fire concurrent requests at a running server and report '
+        'throughput and per-endpoint latency. Run it against the wsgi and '
+        'the asgi container (SERVER_MODE) with the same --concurrency to '
+        'compare; pass --token to include the authenticated endpoints.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='http://localhost:8000',
+            help='Base URL of the running server'
+        )
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--token', help='Auth token for the requests')
+        parser.add_argument(
+            '--recipe-id', type=int, default=1,
+            help='Recipe requested by the detail endpoint'
+        )
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Path to request, may be repeated'
+        )
+
+    def handle(self, *args, **options):
+        headers = {}
+        paths = options['paths'] or PATHS
+        if options['token']:
+            headers['Authorization'] = 'Token %s' % options['token']
+            paths = options['paths'] or PATHS + AUTH_PATHS
+        base_url = options['url'].rstrip('/')
+        urls = [
+            base_url + quote(
+                path.format(recipe_id=options['recipe_id']), safe='/?=&'
+            )
+            for path in paths
+        ]
+
+        def fetch(url):
+            start = perf_counter()
+            try:
+                with urlopen(Request(url, headers=headers)) as response:
+                    response.read()
+                ok = True
+            except (HTTPError, URLError, HTTPException, OSError):
+                ok = False
+            return url, perf_counter() - start, ok
+
+        batch = islice(cycle(urls), options['requests'])
+        start = perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = list(executor.map(fetch, batch))
+        elapsed = perf_counter() - start
+
+        errors = sum(1 for _, _, ok in results if not ok)
+        self.stdout.write(
+            '%d requests, concurrency %d, %d errors, rps %.1f' % (
+                len(results), options['concurrency'], errors,
+                len(results) / elapsed,
+            )
+        )
+        for url in urls:
+            self.write_timings(
+                url[len(base_url):],
+                [timing for other, timing, _ in results if other == url]
+            )
+        self.write_timings('all', [timing for _, timing, _ in results])
+
+    def write_timings(self, label, timings):
+        if not timings:
+            return
+        timings.sort()
+        self.stdout.write(
+            '%-50s p50 %7.1fms  p99 %7.1fms  max %7.1fms' % (
+                label,
+                self.percentile(timings, 50) * 1000,
+                self.percentile(timings, 99) * 1000,
+                timings[-1] * 1000,
+            )
+        )
+
+    @staticmethod
+    def percentile(timings, percent):
+        index = round(percent / 100 * (len(timings) - 1))
+        return timings[index]
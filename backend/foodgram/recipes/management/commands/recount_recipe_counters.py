@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, IngredientInRecipe, Recipe, ShoppingCart
+
+COUNTERS = {
+    'favorites_count': Favorite,
+    'carts_count': ShoppingCart,
+    'ingredients_count': IngredientInRecipe,
+}
+
+
+def count_subquery(model):
+    return Coalesce(Subquery(
+        model.objects.filter(recipe=OuterRef('pk')).order_by().values(
+            'recipe'
+        ).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized recipe counters and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report drift, do not update counters'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.annotate(**{
+            'actual_%s' % field: count_subquery(model)
+            for field, model in COUNTERS.items()
+        })
+        with transaction.atomic():
+            for field in COUNTERS:
+                drift = recipes.exclude(
+                    **{field: F('actual_%s' % field)}
+                ).count()
+                self.stdout.write('%s: %d recipes drifted' % (field, drift))
+            if options['dry_run']:
+                return
+            updated = Recipe.objects.update(**{
+                field: count_subquery(model)
+                for field, model in COUNTERS.items()
+            })
+        self.stdout.write(
+            self.style.SUCCESS('Recomputed counters of %d recipes' % updated)
+        )
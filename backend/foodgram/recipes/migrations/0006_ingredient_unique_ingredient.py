@@ -0,0 +1,44 @@
+# Generated by Django 4.1 on 2026-10-18 12:00
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(keep_id=Min('id'), count=Count('id')).filter(count__gt=1)
+    for duplicate in duplicates:
+        keep_id = duplicate['keep_id']
+        others = Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit']
+        ).exclude(id=keep_id)
+        for row in IngredientInRecipe.objects.filter(ingredient__in=others):
+            if IngredientInRecipe.objects.filter(
+                recipe_id=row.recipe_id, ingredient_id=keep_id
+            ).exists():
+                row.delete()
+            else:
+                row.ingredient_id = keep_id
+                row.save(update_fields=('ingredient',))
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_shoppingcart_unique_shopping_cart'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
@@ -3,6 +3,7 @@ from django.db.models import UniqueConstraint
 from django.utils.translation import gettext_lazy as _
 
 from users.models import User
+from utils.storage import ContentAddressedStorage
 from utils.validators import min_value_validator
 
 
@@ -38,6 +39,12 @@ class Ingredient(models.Model):
         verbose_name = _('Ингредиент')
         verbose_name_plural = _('Ингредиенты')
         ordering = ('name',)
+        constraints = [
+            UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient'
+            )
+        ]
 
     def __str__(self):
         return '%s, %s' % (self.name, self.measurement_unit)
@@ -50,7 +57,13 @@ class Recipe(models.Model):
         verbose_name=_('Автор')
     )
     name = models.CharField(max_length=200, verbose_name=_('Название'))
-    image = models.ImageField(upload_to='recipes/', verbose_name=_('Картинка'))
+    image = models.ImageField(
+        upload_to='recipes/', storage=ContentAddressedStorage(),
+        verbose_name=_('Картинка')
+    )
+    image_variants = models.JSONField(
+        default=dict, editable=False, verbose_name=_('Размеры картинки')
+    )
     text = models.TextField()
     tags = models.ManyToManyField(
         Tag,
@@ -69,16 +82,45 @@ class Recipe(models.Model):
         verbose_name=_('Дата публикации'),
         auto_now_add=True
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name=_('В избранном')
+    )
+    carts_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name=_('В списках покупок')
+    )
+    ingredients_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name=_('Количество ингредиентов')
+    )
 
     class Meta:
         db_table = 'recipes'
         verbose_name = _('Рецепт')
         verbose_name_plural = _('Рецепты')
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'), name='recipes_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipes_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('-favorites_count', '-pub_date', '-id'),
+                name='recipes_favorites_count_idx'
+            )
+        ]
 
     def __str__(self):
         return '%s' % self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered to detect image changes without another query
+        instance.loaded_image = dict(zip(field_names, values)).get('image')
+        return instance
+
 
 class IngredientInRecipe(models.Model):
     ingredient = models.ForeignKey(
@@ -132,6 +174,11 @@ class Favorite(models.Model):
                 name='unique_favorite'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=('user', 'recipe'), name='favorites_user_recipe_idx'
+            )
+        ]
 
 
 class ShoppingCart(models.Model):
@@ -157,3 +204,9 @@ class ShoppingCart(models.Model):
                 name='unique_shopping_cart'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=('user', 'recipe'),
+                name='shopping_cart_user_recipe_idx'
+            )
+        ]
@@ -1,13 +1,15 @@
-from django.shortcuts import get_object_or_404
-from drf_extra_fields.fields import Base64ImageField
+from collections import Counter
+
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
 from users.serializers import UserSerializer
-from utils.validators import min_value_validator
-from .models import (
-    Tag, Ingredient, Recipe, Favorite, ShoppingCart, IngredientInRecipe
-)
+from utils.relations import RelationsListSerializer, get_relations
+from utils.fields import Base64ImageField
+from utils.images import get_variant_urls
+from utils.validators import image_size_validator, min_value_validator
+from .models import Tag, Ingredient, Recipe, IngredientInRecipe
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -40,43 +42,51 @@ class RecipeViewSerializer(serializers.ModelSerializer):
     ingredients = serializers.SerializerMethodField(read_only=True)
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+    image_variants = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+            'is_in_shopping_cart', 'name', 'image', 'image_variants', 'text',
+            'cooking_time'
+        )
+        list_serializer_class = RelationsListSerializer
+
+    def preload_relations(self, instances, relations):
+        recipe_ids = [recipe.id for recipe in instances]
+        relations.load('favorited', recipe_ids)
+        relations.load('in_shopping_cart', recipe_ids)
+        relations.load(
+            'subscribed', (recipe.author_id for recipe in instances)
         )
 
     def get_ingredients(self, obj):
-        ingredients = IngredientInRecipe.objects.select_related(
-            'ingredient', 'recipe'
-        ).filter(recipe=obj)
+        prefetch_related_objects([obj], 'ingredientinrecipe_set__ingredient')
         return IngredientInRecipeSerializer(
-            ingredients, context=self.context, many=True
+            obj.ingredientinrecipe_set.all(), context=self.context, many=True
         ).data
 
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        return (
-            False if user.is_anonymous else
-            Favorite.objects.filter(user=user, recipe=obj).exists()
+        return get_relations(self.context['request']).contains(
+            'favorited', obj.id
         )
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        return (
-            False if user.is_anonymous else
-            ShoppingCart.objects.filter(user=user, recipe=obj).exists()
+        return get_relations(self.context['request']).contains(
+            'in_shopping_cart', obj.id
         )
 
+    def get_image_variants(self, obj):
+        return get_variant_urls(obj, self.context.get('request'))
+
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
     ingredients = IngredientInRecipeSerializer(many=True, write_only=True)
     tags = serializers.PrimaryKeyRelatedField(
         write_only=True, queryset=Tag.objects.all(), many=True
     )
-    image = Base64ImageField()
+    image = Base64ImageField(validators=(image_size_validator,))
 
     class Meta:
         model = Recipe
@@ -93,17 +103,25 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             raise ValidationError(
                 {'error': 'Для рецепта необходим хотя бы один %s' % msg}
             )
-        validated_ingredients = set()
+        ingredient_ids = [
+            ingredient_['ingredient']['id'] for ingredient_ in ingredients
+        ]
+        resolved = Ingredient.objects.in_bulk(ingredient_ids)
+        duplicates = sorted(
+            id_ for id_, count in Counter(ingredient_ids).items() if count > 1
+        )
+        missing = sorted(set(ingredient_ids) - set(resolved))
+        if duplicates or missing:
+            raise ValidationError({
+                'error': 'Ингредиенты должны существовать и не повторяться',
+                'duplicate_ingredients': duplicates,
+                'missing_ingredients': missing
+            })
         for ingredient_ in ingredients:
-            ingredient = get_object_or_404(
-                Ingredient, id=ingredient_['ingredient']['id']
-            )
-            if ingredient.id in validated_ingredients:
-                raise ValidationError(
-                    {'error': 'Ингредиенты в рецепте должны быть уникальны'}
-                )
-            validated_ingredients.add(ingredient.id)
             min_value_validator(int(ingredient_['amount']))
+            ingredient_['ingredient'] = resolved[
+                ingredient_['ingredient']['id']
+            ]
         validated_tags = set()
         for tag_ in tags:
             if tag_.id in validated_tags:
@@ -114,9 +132,11 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         return attrs
 
     def create_ingredients(self, ingredients, recipe):
+        if not ingredients:
+            return
         ingr_objects = [
             IngredientInRecipe(
-                ingredient_id=ingredient['ingredient']['id'],
+                ingredient=ingredient['ingredient'],
                 recipe=recipe,
                 amount=ingredient['amount']
             ) for ingredient in ingredients
@@ -127,20 +147,70 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         author = self.context['request'].user
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(author=author, **validated_data)
+        recipe = Recipe.objects.create(
+            author=author, ingredients_count=len(ingredients),
+            **validated_data
+        )
         recipe.tags.add(*tags)
         self.create_ingredients(ingredients=ingredients, recipe=recipe)
         return recipe
 
+    def update_tags(self, recipe, tags):
+        current = {tag.id for tag in recipe.tags.all()}
+        new = {tag.id for tag in tags}
+        if current - new:
+            recipe.tags.remove(*(current - new))
+        if new - current:
+            recipe.tags.add(*(new - current))
+
+    def update_ingredients(self, recipe, ingredients):
+        current = {
+            row.ingredient_id: row
+            for row in recipe.ingredientinrecipe_set.all()
+        }
+        new = {
+            ingredient['ingredient'].id: ingredient
+            for ingredient in ingredients
+        }
+        deleted = [
+            row.pk for ingredient_id, row in current.items()
+            if ingredient_id not in new
+        ]
+        changed = []
+        for ingredient_id, ingredient in new.items():
+            row = current.get(ingredient_id)
+            if row is not None and row.amount != ingredient['amount']:
+                row.amount = ingredient['amount']
+                changed.append(row)
+        if deleted:
+            IngredientInRecipe.objects.filter(pk__in=deleted).delete()
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ('amount',))
+        self.create_ingredients(
+            ingredients=[
+                ingredient for ingredient_id, ingredient in new.items()
+                if ingredient_id not in current
+            ],
+            recipe=recipe
+        )
+
     def update(self, instance, validated_data):
-        instance.tags.clear()
-        IngredientInRecipe.objects.filter(recipe=instance).delete()
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredients')
-        recipe = super().update(instance, validated_data)
-        instance.tags.add(*tags)
-        self.create_ingredients(ingredients=ingredients, recipe=recipe)
-        return recipe
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        if tags is not None:
+            self.update_tags(instance, tags)
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
+            validated_data['ingredients_count'] = len(ingredients)
+        changed = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        for field in changed:
+            setattr(instance, field, validated_data[field])
+        if changed:
+            instance.save(update_fields=changed)
+        return instance
 
     def to_representation(self, instance):
         return RecipeViewSerializer(instance, context=self.context).data
@@ -1,28 +1,50 @@
-from pathlib import Path
-
-from django.db.models.signals import pre_save, post_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from .models import Recipe
+from utils.caching import (
+    INGREDIENTS_CACHE_KEY, TAGS_CACHE_KEY, invalidate_cached_list
+)
+from utils.images import delete_image_on_commit, generate_variants_on_commit
+from utils.search import invalidate_ingredient_index
+from .models import Ingredient, Recipe, Tag
 
 
 @receiver(post_delete, sender=Recipe, dispatch_uid='delete_media_after_model')
 def delete_media(sender, instance, **kwargs):
     if instance.image:
-        if Path(instance.image.path).is_file():
-            Path(instance.image.path).unlink()
+        delete_image_on_commit(
+            instance.image.storage, instance.image.name,
+            instance.image_variants
+        )
 
 
-@receiver(pre_save, sender=Recipe)
+@receiver(post_save, sender=Recipe)
 def auto_delete_file_on_change(sender, instance, **kwargs):
-    if not instance.pk:
+    # the final, content-addressed name is only known after saving
+    old_name = getattr(instance, 'loaded_image', None)
+    instance.loaded_image = instance.image.name
+    if old_name == instance.image.name:
         return
 
-    try:
-        old_file = Recipe.objects.get(pk=instance.pk).image
-    except Recipe.DoesNotExist:
-        return
+    if old_name:
+        delete_image_on_commit(
+            instance.image.storage, old_name, instance.image_variants
+        )
+    if instance.image_variants:
+        Recipe.objects.filter(pk=instance.pk).update(image_variants={})
+        instance.image_variants = {}
+    if instance.image:
+        generate_variants_on_commit(instance)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients(sender, instance, **kwargs):
+    invalidate_ingredient_index()
+    invalidate_cached_list(INGREDIENTS_CACHE_KEY)
+
 
-    if not old_file == instance.image:
-        if Path(old_file.path).is_file():
-            Path(old_file.path).unlink()
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(sender, instance, **kwargs):
+    invalidate_cached_list(TAGS_CACHE_KEY)
@@ -0,0 +1,179 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from users.models import Subscription, User
+from .models import (
+    Favorite, Ingredient, IngredientInRecipe, Recipe, ShoppingCart, Tag
+)
+
+
+class RecipeListQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass'
+        )
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass'
+        )
+        Subscription.objects.create(subscriber=cls.user, author=author)
+        tags = [
+            Tag.objects.create(
+                name='tag %d' % index, color='#00000%d' % index,
+                slug='tag-%d' % index
+            )
+            for index in range(2)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name='ingredient %d' % index, measurement_unit='g'
+            )
+            for index in range(3)
+        ]
+        for index in range(100):
+            recipe = Recipe.objects.create(
+                author=author, name='recipe %d' % index, text='text',
+                cooking_time=10, image='recipes/image.png'
+            )
+            recipe.tags.set(tags)
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=100
+                )
+                for ingredient in ingredients
+            )
+            if index % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def count_queries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        counts = {
+            limit: self.count_queries('/api/recipes/?limit=%d' % limit)
+            for limit in (1, 10, 100)
+        }
+        self.assertEqual(len(set(counts.values())), 1, counts)
+
+
+class RecipeFilterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass'
+        )
+        tags = [
+            Tag.objects.create(
+                name='tag %d' % index, color='#00000%d' % index,
+                slug='tag-%d' % index
+            )
+            for index in range(3)
+        ]
+        cls.tagged = set()
+        for index in range(6):
+            recipe = Recipe.objects.create(
+                author=cls.user, name='recipe %d' % index, text='text',
+                cooking_time=10, image='recipes/image.png'
+            )
+            # every recipe but the last has two of the filtered tags
+            if index < 5:
+                recipe.tags.set(tags[:2])
+                cls.tagged.add(recipe.pk)
+            else:
+                recipe.tags.set(tags[2:])
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_recipe_ids(self, query):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/recipes/?limit=100&' + query)
+        self.assertEqual(response.status_code, 200)
+        for query in queries:
+            self.assertNotIn('DISTINCT', query['sql'].upper())
+        ids = [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(len(ids), len(set(ids)), 'duplicate rows')
+        self.assertEqual(response.data['count'], len(ids))
+        return set(ids)
+
+    def test_tags_filter(self):
+        self.assertEqual(
+            self.get_recipe_ids('tags=tag-0&tags=tag-1'), self.tagged
+        )
+
+    def test_user_list_filters(self):
+        self.assertEqual(
+            self.get_recipe_ids(
+                'tags=tag-0&tags=tag-1&is_favorited=1&is_in_shopping_cart=1'
+            ),
+            self.tagged
+        )
+
+    def test_counter_ordering_pages_are_stable(self):
+        # all recipes share the same counter, only the tie-breaker orders
+        ids = []
+        for page in (1, 2, 3):
+            response = self.client.get(
+                '/api/recipes/?ordering=-favorites_count&limit=2&page=%d'
+                % page
+            )
+            ids.extend(recipe['id'] for recipe in response.data['results'])
+        self.assertEqual(
+            ids,
+            list(Recipe.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            ))
+        )
+
+    def test_cursor_rejects_ordering(self):
+        response = self.client.get(
+            '/api/recipes/?cursor=&ordering=-favorites_count'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class KeysetPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass'
+        )
+        for index in range(7):
+            Recipe.objects.create(
+                author=author, name='recipe %d' % index, text='text',
+                cooking_time=10, image='recipes/image.png'
+            )
+        # rows sharing a pub_date are ordered by id
+        first = Recipe.objects.order_by('pk').first()
+        Recipe.objects.filter(pk__lte=first.pk + 3).update(
+            pub_date=first.pub_date
+        )
+
+    def test_pages_cover_the_feed_once_in_order(self):
+        client = APIClient()
+        ids = []
+        url = '/api/recipes/?cursor=&limit=2'
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(recipe['id'] for recipe in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(
+            ids,
+            list(Recipe.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            ))
+        )
@@ -1,7 +1,11 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import TagsViewSet, IngredientsViewSet, RecipesViewSet
+from .views import (
+    AsyncIngredientsView, AsyncTagsView, TagsViewSet, IngredientsViewSet,
+    RecipesViewSet
+)
 
 app_name = 'recipes'
 
@@ -13,3 +17,15 @@ recipes_router.register(r'recipes', RecipesViewSet)
 urlpatterns = [
     path('', include(recipes_router.urls))
 ]
+
+if settings.ASYNC_VIEWS:
+    # async views only pay off under ASGI, under WSGI each would need its
+    # own event loop. Recipes and subscriptions stay DRF views, which the
+    # ASGI handler runs in a thread per request.
+    urlpatterns = [
+        path('tags/', AsyncTagsView.as_view(), name='tags-list'),
+        path(
+            'ingredients/', AsyncIngredientsView.as_view(),
+            name='ingredients-list'
+        ),
+    ] + urlpatterns
@@ -1,27 +1,36 @@
-from pathlib import Path
-
-from django.conf import settings
+from asgiref.sync import sync_to_async
 from django.db import transaction
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import Prefetch, Sum
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.decorators import method_decorator
+from django.utils.http import quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet, ModelViewSet
 
+from utils.caching import (
+    AsyncCachedListView, CachedListMixin, INGREDIENTS_CACHE_KEY,
+    TAGS_CACHE_KEY
+)
 from utils.functions import check_exists_and_create_or_delete, get_object
+from utils.pagination import KeysetPagination
 from utils.permissions import IsAuthorOrReadOnly
-from utils.filters import IngredientSearchFilter, RecipeFilterSet
+from utils.shopping_list import (
+    DigestRows, get_cached_document, get_renderer, get_shopping_list_digest,
+    set_cached_document
+)
+from utils.filters import (
+    IngredientSearchFilter, RecipeFilterSet, RecipeOrderingFilter
+)
 from users.serializers import RecipeMinifiedSerializer
 from .models import (
-    Tag, Ingredient, Recipe, Favorite, ShoppingCart
+    Tag, Ingredient, Recipe, Favorite, ShoppingCart, IngredientInRecipe
 )
 from .serializers import (
     TagSerializer, IngredientSerializer, RecipeViewSerializer,
@@ -29,35 +38,91 @@ from .serializers import (
 )
 
 
-class TagsViewSet(ReadOnlyModelViewSet):
+class TagsViewSet(CachedListMixin, ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
+    cache_key = TAGS_CACHE_KEY
 
 
-class IngredientsViewSet(ReadOnlyModelViewSet):
+class IngredientsViewSet(CachedListMixin, ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (IngredientSearchFilter,)
-    search_fields = ('^name',)
     pagination_class = None
+    cache_key = INGREDIENTS_CACHE_KEY
+
+
+class AsyncTagsView(AsyncCachedListView):
+    queryset = Tag.objects.all()
+    serializer_class = TagSerializer
+    cache_key = TAGS_CACHE_KEY
+
+
+class AsyncIngredientsView(AsyncCachedListView):
+    queryset = Ingredient.objects.all()
+    serializer_class = IngredientSerializer
+    cache_key = INGREDIENTS_CACHE_KEY
+
+    async def get(self, request):
+        term = request.GET.get(
+            IngredientSearchFilter.search_param, ''
+        ).strip()
+        if not term:
+            return await super().get(request)
+        ingredients = await sync_to_async(
+            lambda: list(
+                IngredientSearchFilter().search(self.queryset.all(), term)
+            )
+        )()
+        return HttpResponse(
+            JSONRenderer().render(
+                self.serializer_class(ingredients, many=True).data
+            ),
+            content_type='application/json'
+        )
 
 
 @method_decorator(transaction.atomic, name='create')
 @method_decorator(transaction.atomic, name='update')
+@method_decorator(transaction.atomic, name='partial_update')
 class RecipesViewSet(ModelViewSet):
     queryset = Recipe.objects.select_related(
         'author'
     ).prefetch_related(
-        'tags', 'ingredientinrecipe_set'
+        'tags',
+        Prefetch(
+            'ingredientinrecipe_set',
+            queryset=IngredientInRecipe.objects.select_related('ingredient')
+        )
     ).all()
     serializer_class = RecipeViewSerializer
     permission_classes = (IsAuthorOrReadOnly,)
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, RecipeOrderingFilter)
     filterset_class = RecipeFilterSet
+    ordering_fields = ('pub_date', 'favorites_count', 'carts_count')
+
+    @property
+    def paginator(self):
+        # ?cursor switches the feed to keyset pagination, page/limit stays
+        # the default for the current frontend
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if KeysetPagination.cursor_query_param in params:
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
+
+    def perform_content_negotiation(self, request, force=False):
+        # ``format`` selects the shopping list renderer, not a DRF renderer
+        force = force or self.action == 'download_shopping_cart'
+        return super().perform_content_negotiation(request, force=force)
 
     def get_serializer_class(self):
-        if self.action in ('create', 'partial_update', 'destroy'):
+        if self.action in (
+            'create', 'update', 'partial_update', 'destroy'
+        ):
             return RecipeWriteSerializer
         return super().get_serializer_class()
 
@@ -67,6 +132,7 @@ class RecipesViewSet(ModelViewSet):
         user, recipe = get_object(request=request, object_model=Recipe, pk=pk)
         check_exists_and_create_or_delete(
             object_model=Favorite, exists=True,
+            counter=(recipe, 'favorites_count'),
             msg='Рецепт уже есть в избранном',
             user=user, recipe=recipe
         )
@@ -80,6 +146,7 @@ class RecipesViewSet(ModelViewSet):
         user, recipe = get_object(request=request, object_model=Recipe, pk=pk)
         check_exists_and_create_or_delete(
             object_model=Favorite, exists=False,
+            counter=(recipe, 'favorites_count'),
             msg='Рецепт не был добавлен в избранное',
             user=user, recipe=recipe
         )
@@ -94,6 +161,7 @@ class RecipesViewSet(ModelViewSet):
         user, recipe = get_object(request=request, object_model=Recipe, pk=pk)
         check_exists_and_create_or_delete(
             object_model=ShoppingCart, exists=True,
+            counter=(recipe, 'carts_count'),
             msg='Рецепт уже есть в списке покупок',
             user=user, recipe=recipe
         )
@@ -107,6 +175,7 @@ class RecipesViewSet(ModelViewSet):
         user, recipe = get_object(request=request, object_model=Recipe, pk=pk)
         check_exists_and_create_or_delete(
             object_model=ShoppingCart, exists=False,
+            counter=(recipe, 'carts_count'),
             msg='Рецепт не был добавлен в список покупок',
             user=user, recipe=recipe
         )
@@ -122,38 +191,49 @@ class RecipesViewSet(ModelViewSet):
         user = self.request.user
         ingredients = Ingredient.objects.filter(
             recipe__shoppingcart__user=user
-        ).prefetch_related(
-            'recipe_set', 'ingredientinrecipe_set'
         ).annotate(
             ingredient_amount=Sum('ingredientinrecipe__amount')
-        ).values_list('name', 'measurement_unit', 'ingredient_amount')
-        pdfmetrics.registerFont(
-            TTFont(
-                'SF-Pro',
-                Path(settings.DATA_ROOT, 'fonts/SF-Pro.ttf'), 'UTF-8'
+        ).values_list(
+            'name', 'measurement_unit', 'ingredient_amount'
+        ).order_by('name', 'measurement_unit')
+        file_format = request.query_params.get('format', 'pdf')
+        renderer = get_renderer(file_format)
+        if renderer is None:
+            raise ValidationError(
+                {'error': 'Формат %s не поддерживается' % file_format}
             )
-        )
-        response = HttpResponse(content_type='application/pdf')
-        filename = 'shopping_list.pdf'
-        response['Content-Disposition'] = (
-                'attachment; filename="%s"' % filename
-        )
-        file = canvas.Canvas(response, pagesize=A4)
-        file.setFont('SF-Pro', size=24)
-        file.drawString(200, 800, 'Список покупок')
-        file.setFont('SF-Pro', size=16)
-        height = 750
-        for index, (name, unit, amount) in enumerate(ingredients, 1):
-            file.drawString(
-                75, height, '%d. %s (%s) - %s' % (
-                    index, name, unit, amount
-                )
+        digest = get_shopping_list_digest(ingredients.iterator())
+        etag = quote_etag('%s.%s' % (digest, file_format))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response, digest = self.get_shopping_list_response(
+                renderer, ingredients, digest
             )
-            if height <= 50:
-                height = 800
-                file.showPage()
-                file.setFont('SF-Pro', size=16)
-            height -= 25
-        file.showPage()
-        file.save()
+            response['Content-Disposition'] = (
+                'attachment; filename="%s"' % renderer.filename
+            )
+            # the body comes from a second read that may see a newer cart
+            etag = quote_etag('%s.%s' % (digest, file_format))
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
         return response
+
+    @staticmethod
+    def get_shopping_list_response(renderer, ingredients, digest):
+        if renderer.cacheable:
+            document = get_cached_document(digest, renderer.file_format)
+            if document is not None:
+                return HttpResponse(
+                    document, content_type=renderer.content_type
+                ), digest
+        # rows are read again rather than kept in memory, and rendered
+        # before the response is returned: under ASGI the body is sent from
+        # the event loop, where the ORM can't be used. Returns the digest of
+        # the rows that were actually rendered.
+        rows = DigestRows(ingredients.iterator())
+        file = renderer.render_to_file(rows)
+        if renderer.cacheable and rows.hexdigest() == digest:
+            set_cached_document(digest, renderer.file_format, file)
+        return FileResponse(
+            file, content_type=renderer.content_type
+        ), rows.hexdigest()
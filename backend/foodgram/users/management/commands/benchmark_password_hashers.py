@@ -0,0 +1,38 @@
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Report single core login throughput of every password hasher'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rounds', type=int, default=10,
+            help='Password checks per hasher'
+        )
+
+    def handle(self, *args, **options):
+        password = 'correct horse battery staple'
+        self.stdout.write('%-60s %10s %12s' % (
+            'hasher', 'ms/login', 'logins/s'
+        ))
+        for hasher in get_hashers():
+            name = '%s.%s' % (type(hasher).__module__, type(hasher).__name__)
+            try:
+                encoded = hasher.encode(password, hasher.salt())
+            except ValueError as error:
+                # e.g. argon2-cffi is not installed
+                self.stdout.write('%-60s %s' % (name, error))
+                continue
+            started = perf_counter()
+            for _ in range(options['rounds']):
+                hasher.verify(password, encoded)
+            elapsed = (perf_counter() - started) / options['rounds']
+            self.stdout.write('%-60s %10.1f %12.1f%s' % (
+                name, elapsed * 1000, 1 / elapsed,
+                ' (preferred)' if name == settings.PASSWORD_HASHERS[0]
+                else ''
+            ))
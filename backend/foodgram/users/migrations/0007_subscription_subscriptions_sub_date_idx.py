@@ -0,0 +1,17 @@
+# Generated by Django 4.1 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_alter_user_options'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['subscriber', 'date_subscribed'], name='subscriptions_sub_date_idx'),
+        ),
+    ]
@@ -42,6 +42,12 @@ class Subscription(models.Model):
                 name='unique_follow'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=('subscriber', 'date_subscribed'),
+                name='subscriptions_sub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return '%s подписан на %s' % (self.subscriber, self.author)
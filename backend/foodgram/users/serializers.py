@@ -1,10 +1,13 @@
-from django.contrib.auth.hashers import make_password, check_password
+from django.contrib.auth.hashers import make_password
 from django.core import validators
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
 from recipes.models import Recipe
+from utils.functions import get_recent_recipes
+from utils.images import get_variant_urls
+from utils.relations import RelationsListSerializer, get_relations
 from .models import Subscription, User
 
 
@@ -26,16 +29,20 @@ class UserSerializer(serializers.ModelSerializer):
             'id', 'email', 'username', 'first_name',
             'last_name', 'password', 'is_subscribed'
         )
+        list_serializer_class = RelationsListSerializer
 
     def create(self, validated_data):
         validated_data['password'] = make_password(validated_data['password'])
         return super().create(validated_data)
 
+    def preload_relations(self, instances, relations):
+        relations.load('subscribed', (user.id for user in instances))
+
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        return (
-            False if user.is_anonymous else
-            Subscription.objects.filter(subscriber=user, author=obj).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return get_relations(self.context['request']).contains(
+            'subscribed', obj.id
         )
 
 
@@ -48,8 +55,8 @@ class UserSetPasswordSerializer(serializers.ModelSerializer):
         fields = ('new_password', 'current_password')
 
     def update(self, instance, validated_data):
-        if not check_password(
-                validated_data.get('current_password'), instance.password
+        if not instance.check_password(
+                validated_data.get('current_password')
         ):
             raise ValidationError({'error': _('Неверный пароль')})
         instance.set_password(validated_data.get('new_password'))
@@ -58,9 +65,43 @@ class UserSetPasswordSerializer(serializers.ModelSerializer):
 
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField(read_only=True)
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
+
+    def get_image_variants(self, obj):
+        return get_variant_urls(obj, self.context.get('request'))
+
+
+def get_recipes_limit(request):
+    recipes_limit = request.query_params.get('recipes_limit')
+    if not recipes_limit:
+        return None
+    try:
+        recipes_limit = int(recipes_limit)
+    except ValueError:
+        recipes_limit = 0
+    if recipes_limit < 1:
+        raise ValidationError(
+            {'recipes_limit': _('Должно быть положительным целым числом')}
+        )
+    return recipes_limit
+
+
+class SubscriptionListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        subscriptions = list(data.all() if hasattr(data, 'all') else data)
+        recipes = get_recent_recipes(
+            {subscription.author_id for subscription in subscriptions},
+            get_recipes_limit(self.context['request'])
+        )
+        for subscription in subscriptions:
+            subscription.author.recent_recipes = recipes[
+                subscription.author_id
+            ]
+        return super().to_representation(subscriptions)
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
@@ -71,25 +112,29 @@ class SubscriptionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Subscription
         fields = ('user', 'recipes', 'recipes_count')
+        list_serializer_class = SubscriptionListSerializer
 
     def get_user(self, obj):
         author = obj.author
         return UserSerializer(author, context=self.context).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.author.recipe_set.count()
 
     def get_recipes(self, obj):
-        recipes_limit = self.context['request'].query_params.get(
-            'recipes_limit'
-        )
-        recipes = (
-            obj.author.recipe_set.all() if not recipes_limit
-            else obj.author.recipe_set.all()[:int(recipes_limit)]
-        )
+        if hasattr(obj.author, 'recent_recipes'):
+            recipes = obj.author.recent_recipes
+        else:
+            recipes = get_recent_recipes(
+                (obj.author_id,), get_recipes_limit(self.context['request'])
+            )[obj.author_id]
         return RecipeMinifiedSerializer(recipes, many=True).data
 
     def to_representation(self, instance):
+        # the author of a subscription is always followed by its subscriber
+        instance.author.is_subscribed = True
         data = super().to_representation(instance)
         user = data.pop('user')
         for key, value in user.items():
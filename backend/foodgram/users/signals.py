@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from utils.authentication import invalidate_token, invalidate_user_tokens
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+# no sender: the admin saves through the users.User proxy, and post_save is
+# sent with the proxy class
+@receiver(post_save)
+def invalidate_user_credentials(sender, instance, created, **kwargs):
+    # covers password changes and deactivation
+    if isinstance(instance, get_user_model()) and not created:
+        invalidate_user_tokens(instance.pk)
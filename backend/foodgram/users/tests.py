@@ -0,0 +1,22 @@
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .models import User
+
+
+class CachedTokenInvalidationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='pass'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token %s' % token.key)
+
+    def test_deactivation_through_proxy_drops_cached_token(self):
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        # the admin saves users through the users.User proxy
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
@@ -1,3 +1,4 @@
+from django.db.models import Count
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.generics import ListAPIView
@@ -94,4 +95,6 @@ class SubscriptionsListView(ListAPIView):
     def get_queryset(self):
         return Subscription.objects.filter(
             subscriber=self.request.user
-        ).select_related('author').all()
+        ).select_related('author').annotate(
+            recipes_count=Count('author__recipe')
+        ).order_by('date_subscribed', 'pk')
@@ -0,0 +1,99 @@
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+CACHE_KEY = 'auth_token:%s'
+
+
+class LRUCache:
+    """Thread-safe, size-bounded mapping whose entries expire after ttl."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < monotonic():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (monotonic() + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+
+_local_cache = LRUCache(
+    settings.TOKEN_CACHE_LOCAL_SIZE, settings.TOKEN_CACHE_LOCAL_TIMEOUT
+)
+
+
+def get_cache_key(key):
+    # raw tokens are credentials, they are not used as cache keys
+    return CACHE_KEY % sha256(key.encode('utf-8')).hexdigest()
+
+
+def invalidate_token(key):
+    cache_key = get_cache_key(key)
+
+    def invalidate():
+        _local_cache.delete(cache_key)
+        cache.delete(cache_key)
+
+    invalidate()
+    # a request running before the commit could cache the old state again
+    transaction.on_commit(invalidate)
+
+
+def invalidate_user_tokens(user_id):
+    for key in Token.objects.filter(user_id=user_id).values_list(
+            'key', flat=True
+    ):
+        invalidate_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that keeps token -> (user, token) in a per-worker
+    LRU cache in front of the shared Django cache, so most requests skip
+    the authtoken_token JOIN auth_user query.
+
+    Entries are invalidated by the users app signals on logout (token
+    deletion), password change and deactivation (user save). Other
+    workers' LRU entries expire after TOKEN_CACHE_LOCAL_TIMEOUT seconds.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = get_cache_key(key)
+        credentials = _local_cache.get(cache_key)
+        if credentials is None:
+            credentials = cache.get(cache_key)
+            if credentials is None:
+                credentials = super().authenticate_credentials(key)
+                cache.set(
+                    cache_key, credentials, settings.TOKEN_CACHE_TIMEOUT
+                )
+            _local_cache.set(cache_key, credentials)
+        return credentials
@@ -0,0 +1,112 @@
+from hashlib import sha256
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views import View
+from rest_framework.renderers import JSONRenderer
+
+from .routers import use_replicas
+
+TAGS_CACHE_KEY = 'reference:tags'
+INGREDIENTS_CACHE_KEY = 'reference:ingredients'
+
+
+def get_cache_version(cache_key):
+    version_key = '%s:version' % cache_key
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, uuid4().hex, None)
+        version = cache.get(version_key)
+    return version
+
+
+def bump_cache_version(cache_key):
+    cache.set('%s:version' % cache_key, uuid4().hex, None)
+
+
+def get_entry_key(cache_key):
+    # a request that rendered the list before a change stores it under the
+    # old version, where nobody looks for it any more
+    return '%s:%s' % (cache_key, get_cache_version(cache_key))
+
+
+def invalidate_cached_list(cache_key):
+    transaction.on_commit(lambda: bump_cache_version(cache_key))
+
+
+def make_cache_entry(data):
+    content = JSONRenderer().render(data)
+    return quote_etag(sha256(content).hexdigest()), content
+
+
+def make_cached_response(request, entry):
+    etag, content = entry
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(
+        response, public=True, max_age=settings.REFERENCE_DATA_MAX_AGE
+    )
+    return response
+
+
+class CachedListMixin:
+    """
+    Serve list() of nearly static reference data as pre-rendered JSON.
+
+    The rendered bytes and their ETag are cached under `cache_key` and a
+    version that invalidate_cached_list() replaces after every change.
+    Filtered requests are passed through to the regular list().
+    """
+    cache_key = None
+
+    def is_cacheable(self, request):
+        return not request.query_params
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return super().list(request, *args, **kwargs)
+        entry_key = get_entry_key(self.cache_key)
+        entry = cache.get(entry_key)
+        if entry is None:
+            # a lagging replica would be cached until the next change
+            with use_replicas(False):
+                data = super().list(request, *args, **kwargs).data
+            entry = make_cache_entry(data)
+            cache.set(
+                entry_key, entry, settings.REFERENCE_DATA_CACHE_TIMEOUT
+            )
+        return make_cached_response(request, entry)
+
+
+class AsyncCachedListView(View):
+    """
+    Async counterpart of CachedListMixin for the ASGI deployment.
+
+    Serves the same cache entries without a DRF request cycle; only a
+    cache miss touches the database.
+    """
+    queryset = None
+    serializer_class = None
+    cache_key = None
+
+    async def get(self, request):
+        entry_key = await sync_to_async(get_entry_key)(self.cache_key)
+        entry = await cache.aget(entry_key)
+        if entry is None:
+            with use_replicas(False):
+                objects = [obj async for obj in self.queryset.all()]
+            entry = make_cache_entry(
+                self.serializer_class(objects, many=True).data
+            )
+            await cache.aset(
+                entry_key, entry, settings.REFERENCE_DATA_CACHE_TIMEOUT
+            )
+        return make_cached_response(request, entry)
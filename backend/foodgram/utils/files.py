@@ -0,0 +1,37 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.FILE_WORKERS, thread_name_prefix='files'
+)
+
+
+def delete_file(storage, name):
+    try:
+        storage.delete(name)
+    except OSError:
+        logger.exception('Could not delete %s', name)
+
+
+def run_in_background(func, *args):
+    try:
+        func(*args)
+    finally:
+        # the thread's database connections are not reused by anyone else
+        connections.close_all()
+
+
+def run_on_commit(func, *args):
+    """
+    Run func in a background thread once the current transaction commits,
+    so rolled back changes never touch files and slow storage doesn't
+    hold up the response.
+    """
+    transaction.on_commit(
+        lambda: _executor.submit(run_in_background, func, *args)
+    )
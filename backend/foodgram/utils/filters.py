@@ -1,15 +1,85 @@
+from django import forms
+from django.conf import settings
+from django.db import connections
+from django.db.models import (
+    Case, Exists, IntegerField, OuterRef, Value, When
+)
 from django_filters.rest_framework import FilterSet, filters
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
 
-from recipes.models import Recipe
+from recipes.models import Favorite, Recipe, ShoppingCart
+from .search import get_ingredient_index, normalize
 
+TRIGRAM_MIN_LENGTH = 3
 
-class IngredientSearchFilter(SearchFilter):
+
+class IngredientSearchFilter(BaseFilterBackend):
+    """
+    Ingredient autocomplete: prefix matches first, then substring matches,
+    at most INGREDIENT_SEARCH_LIMIT results.
+
+    With INGREDIENT_SEARCH_ENGINE = 'memory' queries are answered from the
+    per-worker IngredientIndex without touching the database. Otherwise on
+    PostgreSQL both lookups are served by the UPPER(name) indexes from
+    recipes migration 0007. Other databases can't compare non-ASCII names
+    case-insensitively, so matching falls back to Python.
+    """
     search_param = 'name'
 
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term:
+            return queryset
+        return self.search(queryset, term)
+
+    def search(self, queryset, term):
+        if settings.INGREDIENT_SEARCH_ENGINE == 'memory':
+            return get_ingredient_index().search(
+                term, settings.INGREDIENT_SEARCH_LIMIT
+            )
+        if connections[queryset.db].vendor == 'postgresql':
+            return self.filter_database(queryset, term)
+        return self.filter_in_memory(queryset, term)
+
+    def filter_database(self, queryset, term):
+        if len(term) < TRIGRAM_MIN_LENGTH:
+            # trigram index can't help with short terms, keep to the prefix
+            return queryset.filter(
+                name__istartswith=term
+            )[:settings.INGREDIENT_SEARCH_LIMIT]
+        return queryset.filter(name__icontains=term).annotate(
+            rank=Case(
+                When(name__istartswith=term, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField()
+            )
+        ).order_by('rank', 'name')[:settings.INGREDIENT_SEARCH_LIMIT]
+
+    def filter_in_memory(self, queryset, term):
+        term = normalize(term)
+        prefix, substring = [], []
+        for ingredient in queryset:
+            name = normalize(ingredient.name)
+            if name.startswith(term):
+                prefix.append(ingredient)
+            elif term in name:
+                substring.append(ingredient)
+        return (prefix + substring)[:settings.INGREDIENT_SEARCH_LIMIT]
+
+
+class MultipleValueField(forms.MultipleChoiceField):
+    """Multiple choice field that accepts any value, without choices."""
+
+    def valid_value(self, value):
+        return True
+
+
+class MultipleValueFilter(filters.MultipleChoiceFilter):
+    field_class = MultipleValueField
+
 
 class RecipeFilterSet(FilterSet):
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = MultipleValueFilter(method='filter_tags')
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
@@ -19,12 +89,50 @@ class RecipeFilterSet(FilterSet):
         model = Recipe
         fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
 
+    def filter_tags(self, queryset, name, value):
+        # semi-join keeps one row per recipe, so no DISTINCT is needed
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'), tag__slug__in=value
+            )
+        ))
+
+    def filter_by_user(self, queryset, model):
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.none()
+        return queryset.filter(Exists(
+            model.objects.filter(recipe=OuterRef('pk'), user=user)
+        ))
+
     def filter_is_favorited(self, queryset, name, value):
         if value:
-            return queryset.filter(favorite__user=self.request.user)
+            return self.filter_by_user(queryset, Favorite)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value:
-            return queryset.filter(shoppingcart__user=self.request.user)
+            return self.filter_by_user(queryset, ShoppingCart)
         return queryset
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter that breaks ties by publication date and id. Most
+    recipes share the same counter values, and without a unique tail the
+    OFFSET pages of ?ordering=-favorites_count could repeat or skip rows.
+    """
+    tie_breaker = ('-pub_date', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        fields = {field.lstrip('-') for field in ordering}
+        return [
+            *ordering,
+            *(
+                field for field in self.tie_breaker
+                if field.lstrip('-') not in fields
+            )
+        ]
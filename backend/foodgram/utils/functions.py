@@ -1,6 +1,15 @@
+from json import JSONDecoder
+
+from django.db import connection, transaction
+from django.db.models import F
 from django.shortcuts import get_object_or_404
 from rest_framework.exceptions import ValidationError
 
+from recipes.models import Recipe
+
+JSON_SEPARATORS = ' \t\r\n,'
+JSON_DELIMITERS = tuple(JSON_SEPARATORS + ']')
+
 
 def get_object(request, object_model, pk):
     user = request.user
@@ -9,16 +18,123 @@ def get_object(request, object_model, pk):
     return user, obj
 
 
-def check_exists_and_create_or_delete(object_model, exists, msg, **kwargs):
+def get_recent_recipes(author_ids, limit=None):
+    """
+    Map author id to that author's newest recipes, at most limit each.
+
+    All authors are served by one query: ROW_NUMBER() OVER (PARTITION BY
+    author_id) ranks the recipes and the outer query keeps the top ones.
+    """
+    recipes = {author_id: [] for author_id in author_ids}
+    if not recipes:
+        return recipes
+    if limit is None:
+        queryset = Recipe.objects.filter(
+            author_id__in=recipes
+        ).order_by('-pub_date', '-id')
+    else:
+        queryset = Recipe.objects.raw(
+            'SELECT * FROM ('
+            'SELECT id, author_id, name, image, image_variants, '
+            'cooking_time, '
+            'ROW_NUMBER() OVER ('
+            'PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+            ') AS row_number FROM {table} WHERE author_id IN ({ids})'
+            ') ranked WHERE row_number <= %s ORDER BY row_number'.format(
+                table=connection.ops.quote_name(Recipe._meta.db_table),
+                ids=', '.join(['%s'] * len(recipes))
+            ),
+            [*recipes, limit]
+        )
+    for recipe in queryset:
+        recipes[recipe.author_id].append(recipe)
+    return recipes
+
+
+def update_counter(instance, field, delta):
+    type(instance).objects.filter(pk=instance.pk).update(
+        **{field: F(field) + delta}
+    )
+
+
+def check_exists_and_create_or_delete(object_model, exists, msg,
+                                      counter=None, **kwargs):
+    """
+    Create or delete the object_model row matching kwargs.
+
+    counter is an optional (instance, field) pair whose counter column is
+    changed in the same transaction as the row.
+    """
     if exists:
         if object_model.objects.filter(**kwargs).exists():
             raise ValidationError(
                 {'error': msg}
             )
-        return object_model.objects.create(**kwargs)
+        with transaction.atomic():
+            obj = object_model.objects.create(**kwargs)
+            if counter:
+                update_counter(*counter, 1)
+        return obj
     else:
         if not object_model.objects.filter(**kwargs).exists():
             raise ValidationError(
                 {'error': msg},
             )
-        object_model.objects.filter(**kwargs).delete()
+        with transaction.atomic():
+            deleted, _ = object_model.objects.filter(**kwargs).delete()
+            if counter and deleted:
+                update_counter(*counter, -deleted)
+
+
+def _skip_separators(buffer, position):
+    while position < len(buffer) and buffer[position] in JSON_SEPARATORS:
+        position += 1
+    return position
+
+
+def _read_array_start(file, chunk_size):
+    """Consume the input up to the opening bracket, return what follows."""
+    buffer = ''
+    while not buffer:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            raise ValueError('Expected a JSON array')
+        buffer = chunk.lstrip()
+    if buffer[0] != '[':
+        raise ValueError('Expected a JSON array')
+    return buffer[1:]
+
+
+def _decode_item(decoder, buffer, position, final):
+    """Decode the item at position, None if the buffer holds only part."""
+    try:
+        item, end = decoder.raw_decode(buffer, position)
+    except ValueError:
+        if final:
+            raise
+        return None
+    # a number cut by the chunk boundary decodes as a shorter number, only
+    # an item followed by a delimiter is known to be complete
+    if not final and buffer[end:end + 1] not in JSON_DELIMITERS:
+        return None
+    return item, end
+
+
+def iter_json_array(file, chunk_size=64 * 1024):
+    """Yield items of a top-level JSON array without reading it whole."""
+    decoder = JSONDecoder()
+    buffer, position, final = _read_array_start(file, chunk_size), 0, False
+    while True:
+        position = _skip_separators(buffer, position)
+        if position < len(buffer):
+            if buffer[position] == ']':
+                return
+            decoded = _decode_item(decoder, buffer, position, final)
+            if decoded is not None:
+                item, position = decoded
+                yield item
+                continue
+        if final:
+            raise ValueError('Unexpected end of JSON array')
+        chunk = file.read(chunk_size)
+        buffer, position, final = buffer[position:] + chunk, 0, not chunk
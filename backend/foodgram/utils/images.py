@@ -0,0 +1,114 @@
+import logging
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from recipes.models import Recipe
+from .files import delete_file, run_on_commit
+from .storage import lock_stored_name
+
+logger = logging.getLogger(__name__)
+
+VARIANT_FORMAT = 'WEBP'
+VARIANT_EXTENSION = 'webp'
+
+
+VARIANTS_DIRECTORY = 'recipes/variants'
+
+
+def get_variant_name(name, size):
+    # keyed by the original's digest, not the variant's own: two originals
+    # that decode to the same pixels must not share variant files, which
+    # are deleted together with their original
+    width, height = size
+    return '%s/%s_%dx%d_q%d.%s' % (
+        VARIANTS_DIRECTORY, PurePosixPath(name).stem, width, height,
+        settings.RECIPE_IMAGE_QUALITY, VARIANT_EXTENSION
+    )
+
+
+def generate_variants(recipe_id, name):
+    """
+    Decode the recipe image once and store a resized WebP file for every
+    size in RECIPE_IMAGE_VARIANTS. Runs in a background thread.
+    """
+    storage = Recipe._meta.get_field('image').storage
+    shared = Recipe.objects.filter(image=name).exclude(
+        image_variants={}
+    ).values_list('image_variants', flat=True).first()
+    if shared:
+        # the same image is already used and processed by another recipe
+        Recipe.objects.filter(pk=recipe_id, image=name).update(
+            image_variants=shared
+        )
+        return
+    variants = {}
+    try:
+        # keeps the variant name locks until image_variants is committed
+        with transaction.atomic(), storage.open(name) as file, \
+                Image.open(file) as image:
+            # JPEG can be decoded at a reduced scale right away
+            image.draft('RGB', max(settings.RECIPE_IMAGE_VARIANTS.values()))
+            image = ImageOps.exif_transpose(image)
+            image = image.convert(
+                'RGBA' if 'A' in image.getbands() else 'RGB'
+            )
+            for variant, size in settings.RECIPE_IMAGE_VARIANTS.items():
+                resized = image.copy()
+                resized.thumbnail(size, Image.LANCZOS)
+                buffer = BytesIO()
+                resized.save(
+                    buffer, VARIANT_FORMAT,
+                    quality=settings.RECIPE_IMAGE_QUALITY
+                )
+                variants[variant] = storage.save_derived(
+                    get_variant_name(name, size),
+                    ContentFile(buffer.getvalue())
+                )
+            updated = Recipe.objects.filter(
+                pk=recipe_id, image=name
+            ).update(image_variants=variants)
+        if not updated:
+            # the image was replaced while the variants were generated
+            delete_unreferenced_image(storage, name, variants)
+    except Exception:
+        logger.exception('Could not generate variants of %s', name)
+
+
+def generate_variants_on_commit(recipe):
+    run_on_commit(generate_variants, recipe.pk, recipe.image.name)
+
+
+def delete_unreferenced_image(storage, name, variants):
+    """
+    Delete an image and its variants unless a recipe still uses it.
+
+    Images are content-addressed and shared between recipes, the image
+    column is their reference count. The check and the deletion run under
+    the lock that storage takes when it reuses the file, so an upload of
+    the same content in a concurrent transaction either waits for the
+    deletion and writes the file again, or commits its reference first.
+    """
+    with transaction.atomic():
+        lock_stored_name(name)
+        if Recipe.objects.filter(image=name).exists():
+            return
+        for file_name in (name, *variants.values()):
+            delete_file(storage, file_name)
+
+
+def delete_image_on_commit(storage, name, variants):
+    run_on_commit(delete_unreferenced_image, storage, name, variants)
+
+
+def get_variant_urls(recipe, request=None):
+    """URLs of the generated variants, empty until they are ready."""
+    urls = {}
+    for variant, name in recipe.image_variants.items():
+        url = recipe.image.storage.url(name)
+        urls[variant] = request.build_absolute_uri(url) if request else url
+    return urls
@@ -0,0 +1,62 @@
+from pathlib import Path
+from tempfile import SpooledTemporaryFile
+from threading import Lock
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from .shopping_list import SPOOL_MAX_SIZE
+
+FONT_NAME = 'SF-Pro'
+
+_font_lock = Lock()
+_font_registered = False
+
+
+def register_font():
+    """Register the shopping list font once per process."""
+    global _font_registered
+    if _font_registered:
+        return
+    with _font_lock:
+        if not _font_registered:
+            pdfmetrics.registerFont(
+                TTFont(
+                    FONT_NAME,
+                    Path(settings.DATA_ROOT, 'fonts/SF-Pro.ttf'), 'UTF-8'
+                )
+            )
+            _font_registered = True
+
+
+def render_shopping_list(ingredients):
+    """
+    Render (name, measurement_unit, amount) rows into a PDF.
+
+    Returns a spooled file rewound to the start: small lists stay in memory,
+    large ones are moved to disk so worker memory does not grow with the
+    cart size.
+    """
+    register_font()
+    file = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    pdf = canvas.Canvas(file, pagesize=A4)
+    pdf.setFont(FONT_NAME, size=24)
+    pdf.drawString(200, 800, 'Список покупок')
+    pdf.setFont(FONT_NAME, size=16)
+    height = 750
+    for index, (name, unit, amount) in enumerate(ingredients, 1):
+        pdf.drawString(
+            75, height, '%d. %s (%s) - %s' % (index, name, unit, amount)
+        )
+        if height <= 50:
+            height = 800
+            pdf.showPage()
+            pdf.setFont(FONT_NAME, size=16)
+        height -= 25
+    pdf.showPage()
+    pdf.save()
+    file.seek(0)
+    return file
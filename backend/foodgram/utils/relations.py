@@ -0,0 +1,98 @@
+import logging
+from asyncio import iscoroutinefunction
+
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework import serializers
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+
+logger = logging.getLogger(__name__)
+
+SOURCES = {
+    'subscribed': (Subscription, 'subscriber', 'author_id'),
+    'favorited': (Favorite, 'user', 'recipe_id'),
+    'in_shopping_cart': (ShoppingCart, 'user', 'recipe_id'),
+}
+
+
+class UserRelations:
+    """
+    Requesting user's subscriptions, favorites and shopping cart, loaded
+    only for the objects being serialized.
+
+    List serializers preload the ids of the whole page with one IN query
+    per relation; single objects are loaded lazily on first lookup.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.queries = 0
+        self.lookups = 0
+        self.ids = {kind: set() for kind in SOURCES}
+        self.loaded = {kind: set() for kind in SOURCES}
+
+    def load(self, kind, pks):
+        if self.user.is_anonymous:
+            return
+        missing = set(pks) - self.loaded[kind]
+        if not missing:
+            return
+        model, user_field, pk_field = SOURCES[kind]
+        self.ids[kind].update(model.objects.filter(**{
+            user_field: self.user, '%s__in' % pk_field: missing
+        }).values_list(pk_field, flat=True))
+        self.loaded[kind] |= missing
+        self.queries += 1
+
+    def contains(self, kind, pk):
+        if self.user.is_anonymous:
+            return False
+        self.load(kind, (pk,))
+        self.lookups += 1
+        return pk in self.ids[kind]
+
+
+def get_relations(request):
+    # kept on the Django request so the middleware can report it
+    request = getattr(request, '_request', request)
+    if not hasattr(request, 'user_relations'):
+        request.user_relations = UserRelations(request.user)
+    return request.user_relations
+
+
+class RelationsListSerializer(serializers.ListSerializer):
+    """Let the child serializer preload relations for the whole list."""
+
+    def to_representation(self, data):
+        instances = list(data.all() if hasattr(data, 'all') else data)
+        self.child.preload_relations(
+            instances, get_relations(self.context['request'])
+        )
+        return super().to_representation(instances)
+
+
+def log_relations(request):
+    relations = getattr(request, 'user_relations', None)
+    if relations is not None:
+        logger.debug(
+            '%s %s: %d relation lookups served by %d queries',
+            request.method, request.path,
+            relations.lookups, relations.queries
+        )
+
+
+@sync_and_async_middleware
+def user_relations_middleware(get_response):
+    """Log how many relation lookups a request served from memory."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            response = await get_response(request)
+            log_relations(request)
+            return response
+    else:
+        def middleware(request):
+            response = get_response(request)
+            log_relations(request)
+            return response
+    return middleware
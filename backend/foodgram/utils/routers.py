@@ -0,0 +1,109 @@
+import random
+from asyncio import iscoroutinefunction
+from contextlib import contextmanager
+from contextvars import ContextVar
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.decorators import sync_and_async_middleware
+
+PIN_CACHE_KEY = 'db_primary_pin:%s'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# tokens are read right after login, before a replica may have them
+PRIMARY_ONLY_MODELS = {'authtoken.token'}
+
+_replica = ContextVar('replica', default=None)
+
+
+@contextmanager
+def use_replicas(enabled=True):
+    """
+    Read from one randomly chosen replica inside the block, so that
+    related reads (a page and its count, a prefetch and its parent rows)
+    see the same replication state.
+    """
+    replica = None
+    if enabled and settings.DATABASE_REPLICAS:
+        replica = random.choice(settings.DATABASE_REPLICAS)
+    token = _replica.set(replica)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Send reads to the replica chosen by use_replicas() and everything else
+    to the primary.
+
+    The middleware enters use_replicas() for safe-method requests, so
+    management commands, background tasks and read-modify-write code keep
+    reading from the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = _replica.get()
+        if (
+            replica is not None
+            and model._meta.label_lower not in PRIMARY_ONLY_MODELS
+        ):
+            return replica
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def get_pin_key(request):
+    # token clients are told apart by their header, the admin by its
+    # session; anonymous clients have nothing of their own to read back
+    client = (
+        request.META.get('HTTP_AUTHORIZATION')
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not client:
+        return None
+    return PIN_CACHE_KEY % sha256(client.encode('utf-8')).hexdigest()
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(get_response):
+    """
+    Route safe-method requests to the replicas, except for clients that
+    changed something in the last REPLICA_PIN_TIMEOUT seconds: those read
+    from the primary until the replicas have caught up with their write.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            pin_key = get_pin_key(request)
+            if request.method not in SAFE_METHODS:
+                response = await get_response(request)
+                if pin_key is not None and response.status_code < 400:
+                    await cache.aset(
+                        pin_key, True, settings.REPLICA_PIN_TIMEOUT
+                    )
+                return response
+            pinned = pin_key is not None and await cache.aget(pin_key, False)
+            with use_replicas(not pinned):
+                return await get_response(request)
+    else:
+        def middleware(request):
+            pin_key = get_pin_key(request)
+            if request.method not in SAFE_METHODS:
+                response = get_response(request)
+                if pin_key is not None and response.status_code < 400:
+                    cache.set(pin_key, True, settings.REPLICA_PIN_TIMEOUT)
+                return response
+            pinned = pin_key is not None and cache.get(pin_key, False)
+            with use_replicas(not pinned):
+                return get_response(request)
+    return middleware
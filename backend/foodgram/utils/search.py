@@ -0,0 +1,96 @@
+from bisect import bisect_left
+from threading import Lock
+
+from django.db import transaction
+
+from recipes.models import Ingredient
+from .caching import bump_cache_version, get_cache_version
+from .routers import use_replicas
+
+INDEX_CACHE_KEY = 'ingredient_index'
+TRIE_DEPTH = 6
+
+_index_lock = Lock()
+_index = None
+
+
+def normalize(value):
+    return value.casefold().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """
+    Read-only ingredient catalog for autocomplete.
+
+    Ingredients are kept in an array sorted by normalized name, so every
+    prefix matches a contiguous slice of it. A trie over the first
+    TRIE_DEPTH characters stores that slice per prefix; longer prefixes
+    are narrowed down with a binary search inside the slice.
+    """
+
+    def __init__(self, ingredients, version):
+        self.version = version
+        self.ingredients = sorted(
+            ingredients, key=lambda ingredient: normalize(ingredient.name)
+        )
+        self.names = [
+            normalize(ingredient.name) for ingredient in self.ingredients
+        ]
+        self.trie = {'range': (0, len(self.names)), 'children': {}}
+        for position, name in enumerate(self.names):
+            node = self.trie
+            for char in name[:TRIE_DEPTH]:
+                node = node['children'].setdefault(
+                    char, {'range': (position, position), 'children': {}}
+                )
+                node['range'] = (node['range'][0], position + 1)
+
+    def prefix_range(self, term):
+        node = self.trie
+        for char in term[:TRIE_DEPTH]:
+            node = node['children'].get(char)
+            if node is None:
+                return 0, 0
+        start, end = node['range']
+        if len(term) > TRIE_DEPTH:
+            start = bisect_left(self.names, term, start, end)
+            end = bisect_left(self.names, term + '\uffff', start, end)
+        return start, end
+
+    def search(self, term, limit):
+        term = normalize(term)
+        start, end = self.prefix_range(term)
+        result = self.ingredients[start:min(end, start + limit)]
+        if len(result) < limit:
+            for position, name in enumerate(self.names):
+                if term in name and not start <= position < end:
+                    result.append(self.ingredients[position])
+                    if len(result) == limit:
+                        break
+        return result
+
+
+def invalidate_ingredient_index():
+    # bumped before the commit, the version could be rebuilt from old rows
+    transaction.on_commit(lambda: bump_cache_version(INDEX_CACHE_KEY))
+
+
+def get_ingredient_index():
+    """Return the worker's ingredient index, reloading it when stale."""
+    global _index
+    version = get_cache_version(INDEX_CACHE_KEY)
+    if _index is not None and _index.version == version:
+        return _index
+    with _index_lock:
+        if _index is None or _index.version != version:
+            # the index is kept for the whole version, so it is never built
+            # from a replica that may not have the change yet
+            with use_replicas(False):
+                ingredients = [
+                    Ingredient(id=pk, name=name, measurement_unit=unit)
+                    for pk, name, unit in Ingredient.objects.values_list(
+                        'id', 'name', 'measurement_unit'
+                    )
+                ]
+            _index = IngredientIndex(ingredients, version)
+    return _index
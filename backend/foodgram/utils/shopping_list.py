@@ -0,0 +1,164 @@
+from csv import writer
+from hashlib import sha256
+from io import SEEK_END
+from json import dumps
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.cache import cache
+
+CACHE_KEY = 'shopping_list:%s:%s'
+CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_SIZE = 1024 * 1024
+TITLE = 'Список покупок'
+
+
+class Echo:
+    """File-like object that returns written values instead of storing."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer:
+    """
+    Base class for shopping list formats.
+
+    Subclasses yield the document as chunks of bytes, which
+    render_to_file() writes to a spooled file that is sent as the
+    response. Renderers that are expensive to run set `cacheable`, their
+    file is copied into the cache when it is small enough.
+    """
+    file_format = None
+    content_type = None
+    cacheable = False
+
+    def render(self, ingredients):
+        raise NotImplementedError
+
+    def render_to_file(self, ingredients):
+        """Render into a spooled file rewound to the start."""
+        file = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        for chunk in self.render(ingredients):
+            file.write(chunk)
+        file.seek(0)
+        return file
+
+    @property
+    def filename(self):
+        return 'shopping_list.%s' % self.file_format
+
+
+class PdfRenderer(ShoppingListRenderer):
+    file_format = 'pdf'
+    content_type = 'application/pdf'
+    cacheable = True
+
+    def render(self, ingredients):
+        file = self.render_to_file(ingredients)
+        return iter(lambda: file.read(CHUNK_SIZE), b'')
+
+    def render_to_file(self, ingredients):
+        from .pdf import render_shopping_list
+
+        return render_shopping_list(ingredients)
+
+
+class CsvRenderer(ShoppingListRenderer):
+    file_format = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+
+    def render(self, ingredients):
+        csv_writer = writer(Echo())
+        yield csv_writer.writerow(
+            ('name', 'measurement_unit', 'amount')
+        ).encode('utf-8')
+        for row in ingredients:
+            yield csv_writer.writerow(row).encode('utf-8')
+
+
+class TxtRenderer(ShoppingListRenderer):
+    file_format = 'txt'
+    content_type = 'text/plain; charset=utf-8'
+
+    def render(self, ingredients):
+        yield ('%s\n\n' % TITLE).encode('utf-8')
+        for index, (name, unit, amount) in enumerate(ingredients, 1):
+            yield ('%d. %s (%s) - %s\n' % (
+                index, name, unit, amount
+            )).encode('utf-8')
+
+
+class JsonRenderer(ShoppingListRenderer):
+    file_format = 'json'
+    content_type = 'application/json'
+
+    def render(self, ingredients):
+        separator = '['
+        for name, unit, amount in ingredients:
+            yield (separator + dumps(
+                {'name': name, 'measurement_unit': unit, 'amount': amount},
+                ensure_ascii=False
+            )).encode('utf-8')
+            separator = ','
+        yield b'[]' if separator == '[' else b']'
+
+
+RENDERERS = {}
+
+
+def register_renderer(renderer_class):
+    RENDERERS[renderer_class.file_format] = renderer_class()
+    return renderer_class
+
+
+for _renderer_class in (PdfRenderer, CsvRenderer, TxtRenderer, JsonRenderer):
+    register_renderer(_renderer_class)
+
+
+def get_renderer(file_format):
+    return RENDERERS.get(file_format)
+
+
+class DigestRows:
+    """
+    Iterate aggregated (name, measurement_unit, amount) rows and hash
+    them on the way, so the rows never have to be held in a list.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.hasher = sha256()
+
+    def __iter__(self):
+        for row in self.rows:
+            self.hasher.update(
+                dumps(row, ensure_ascii=False).encode('utf-8') + b'\n'
+            )
+            yield row
+
+    def hexdigest(self):
+        return self.hasher.hexdigest()
+
+
+def get_shopping_list_digest(rows):
+    """Digest of aggregated (name, measurement_unit, amount) rows."""
+    rows = DigestRows(rows)
+    for _ in rows:
+        pass
+    return rows.hexdigest()
+
+
+def get_cached_document(digest, file_format):
+    return cache.get(CACHE_KEY % (file_format, digest))
+
+
+def set_cached_document(digest, file_format, file):
+    """Copy a rendered file into the cache unless it is too large."""
+    if file.seek(0, SEEK_END) <= settings.SHOPPING_LIST_CACHE_MAX_SIZE:
+        file.seek(0)
+        cache.set(
+            CACHE_KEY % (file_format, digest), file.read(),
+            settings.SHOPPING_LIST_CACHE_TIMEOUT
+        )
+    file.seek(0)
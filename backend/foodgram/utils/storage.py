@@ -0,0 +1,78 @@
+from hashlib import sha256
+from pathlib import PurePosixPath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.utils.deconstruct import deconstructible
+
+
+def lock_stored_name(name):
+    """
+    Lock a stored name until the current transaction ends.
+
+    Reusing a stored file and deleting an unreferenced one both take this
+    lock, so a file cannot be deleted between being reused and the new
+    reference being committed. Only PostgreSQL has advisory locks; other
+    databases serialize writers anyway.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    key = int.from_bytes(
+        sha256(name.encode('utf-8')).digest()[:8], 'big', signed=True
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [key])
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names files by the SHA-256 of their content.
+
+    A file requested as recipes/photo.png is stored as
+    recipes/ab/cd/abcd….png, sharded by the first bytes of the digest.
+    Saving content that is already stored returns the existing name, so
+    identical uploads share one file; callers must only delete a name
+    once nothing references it anymore, holding lock_stored_name() while
+    they check. Stored files never change, which lets them be served with
+    immutable cache headers.
+    """
+    shard_levels = 2
+
+    def get_content_name(self, name, content):
+        digest = sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        path = PurePosixPath(name)
+        shards = [
+            digest[level * 2:level * 2 + 2]
+            for level in range(self.shard_levels)
+        ]
+        return str(path.parent.joinpath(
+            *shards, digest + path.suffix.lower()
+        ))
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_content_name(name, content)
+        # held until the referencing row is committed
+        lock_stored_name(name)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    def save_derived(self, name, content):
+        """
+        Store content derived from a stored file, such as a resized copy,
+        under `name` as given. The name must be built from the original's
+        digest, so the derived file lives and dies with the original.
+        """
+        lock_stored_name(name)
+        if self.exists(name):
+            return name
+        return super().save(name, content)
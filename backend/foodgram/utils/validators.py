@@ -1,4 +1,16 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.utils.translation import gettext_lazy as _
 
 min_value_validator = MinValueValidator(0, _('Значение должно быть больше 0'))
+
+
+def image_size_validator(image):
+    if image.size > settings.RECIPE_IMAGE_MAX_SIZE:
+        raise ValidationError(_('Размер картинки слишком большой'))
+    decoded = getattr(image, 'image', None)
+    if decoded and (
+            decoded.width * decoded.height > settings.RECIPE_IMAGE_MAX_PIXELS
+    ):
+        raise ValidationError(_('Разрешение картинки слишком большое'))